@@ -0,0 +1,82 @@
+"""Memory and latency of the in-memory catalog compared with the ORM path.
+
+Fills a throwaway SQLite database with synthetic characters and planets.
+
+    python benchmarks/catalog_memory.py [rows]
+"""
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from app import create_app  # noqa: E402
+from catalog import Catalog  # noqa: E402
+from models import db, Character, Planet  # noqa: E402
+
+COLORS = ["blue", "brown", "black", "blond", "red", "yellow", "white", "none"]
+CLIMATES = ["arid", "temperate", "frozen", "murky", "tropical"]
+
+
+def seed(rows):
+    planets = [
+        {"id": i + 1, "name": f"Planet {i}", "diameter": 10000 + i, "climate": CLIMATES[i % 5],
+         "gravity": "1 standard", "terrain": "desert", "surface_water": i % 100, "population": str(i * 1000)}
+        for i in range(rows // 10 or 1)
+    ]
+    people = [
+        {"name": f"Character {i}", "height": 150 + i % 60, "mass": 50 + i % 80, "hair_color": COLORS[i % 8],
+         "skin_color": COLORS[(i + 3) % 8], "eye_color": COLORS[(i + 5) % 8], "birth_year": f"{i % 200}BBY",
+         "gender": ("male", "female", "n/a")[i % 3], "homeworld_id": i % len(planets) + 1}
+        for i in range(rows)
+    ]
+    db.session.execute(Planet.__table__.insert(), planets)
+    db.session.execute(Character.__table__.insert(), people)
+    db.session.commit()
+
+
+def measure(build):
+    db.session.expunge_all()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - started
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size, elapsed
+
+
+def main(rows=20000):
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://"})
+    with app.app_context():
+        db.create_all()
+        seed(rows)
+
+        orm, orm_bytes, orm_load = measure(lambda: Character.query.all() + Planet.query.all())
+        started = time.perf_counter()
+        json.dumps([item.serialize() for item in orm], sort_keys=True, separators=(",", ":")).encode("utf-8")
+        orm_serialize = time.perf_counter() - started
+        del orm
+
+        def load_catalog():
+            catalog = Catalog(reload_seconds=0)
+            catalog.load()
+            return catalog
+
+        catalog, catalog_bytes, catalog_load = measure(load_catalog)
+        started = time.perf_counter()
+        listings = catalog.people.listing(), catalog.planets.listing()
+        catalog_serialize = time.perf_counter() - started
+        # The listings stay cached once served, so they are part of the footprint
+        catalog_bytes += sum(sys.getsizeof(listing) for listing in listings)
+
+    print(f"{rows} characters")
+    print(f"orm      {orm_bytes / 1024:10.0f} KiB  load {orm_load * 1000:8.1f} ms  serialize {orm_serialize * 1000:8.1f} ms")
+    print(f"catalog  {catalog_bytes / 1024:10.0f} KiB  load {catalog_load * 1000:8.1f} ms  serialize {catalog_serialize * 1000:8.1f} ms")
+    print(f"catalog self-reported footprint: {catalog.memory_footprint()}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,146 @@
+"""Favorites lookups: batching and the partitioned layout.
+
+By default a throwaway SQLite database compares the old one-query-per-favorite
+loop with FavoriteRepository. SQLite has no partitions, so the layouts are
+only compared on Postgres: pass --database-url to use DATABASE_URL. The
+comparison then runs on temporary tables, a plain one and one hash partitioned
+by user_id like the migration builds, which disappear with the connection.
+The application tables are never created, written or dropped there.
+
+    python benchmarks/favorites.py [users] [favorites_per_user] [--database-url]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from sqlalchemy import text  # noqa: E402
+from app import create_app  # noqa: E402
+from favorites import FavoriteRepository  # noqa: E402
+from models import db, User, Character, Planet, Favorite  # noqa: E402
+
+PARTITIONS = int(os.getenv("FAVORITE_PARTITIONS", "16"))
+
+
+def seed(users, per_user):
+    items = max(per_user, 100)
+    db.session.execute(Planet.__table__.insert(), [{"id": i, "name": f"Planet {i}"} for i in range(1, items + 1)])
+    db.session.execute(Character.__table__.insert(), [{"id": i, "name": f"Character {i}"} for i in range(1, items + 1)])
+    db.session.execute(User.__table__.insert(), [
+        {"id": i, "email": f"user{i}@example.com", "password": "x", "username": f"user{i}", "is_active": True}
+        for i in range(1, users + 1)
+    ])
+    favorites = []
+    for user_id in range(1, users + 1):
+        for n in range(per_user):
+            item_type = "character" if n % 2 else "planet"
+            favorites.append({"user_id": user_id, "item_type": item_type, "item_id": n // 2 + 1})
+            if len(favorites) == 10000:
+                db.session.execute(Favorite.__table__.insert(), favorites)
+                favorites = []
+    if favorites:
+        db.session.execute(Favorite.__table__.insert(), favorites)
+    db.session.commit()
+
+
+def legacy_items(user_id):
+    result = []
+    for fav in Favorite.query.filter_by(user_id=user_id).all():
+        model = Character if fav.item_type == 'character' else Planet
+        item = db.session.get(model, fav.item_id)
+        if item:
+            result.append({"id": fav.id, "type": fav.item_type, "item": item.serialize()})
+    return result
+
+
+def timed(fn, user_ids):
+    samples = []
+    for user_id in user_ids:
+        started = time.perf_counter()
+        fn(user_id)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+def compare_batching(users=2000, per_user=50):
+    url = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "favorites.db")
+    app = create_app({"SQLALCHEMY_DATABASE_URI": url})
+    with app.app_context():
+        db.create_all()
+        seed(users, per_user)
+
+        user_ids = list(range(1, users + 1, max(1, users // 50)))
+        repository = FavoriteRepository()
+
+        def cold(fn):
+            def run(user_id):
+                db.session.expunge_all()
+                return fn(user_id)
+            return run
+
+        print(f"{users} users x {per_user} favorites on sqlite")
+        print(f"legacy loop   {timed(cold(legacy_items), user_ids):8.2f} ms per user")
+        print(f"repository    {timed(cold(repository.items_for_user), user_ids):8.2f} ms per user")
+
+
+def create_layouts(connection, users, per_user):
+    # Same columns and keys as the migrated favorite table
+    columns = """
+        id SERIAL, user_id INTEGER NOT NULL, item_type SMALLINT NOT NULL, item_id INTEGER NOT NULL,
+        PRIMARY KEY (id, user_id), UNIQUE (user_id, item_type, item_id)
+    """
+    connection.execute(text(f"CREATE TEMPORARY TABLE bench_favorite_plain ({columns})"))
+    connection.execute(text(f"CREATE TEMPORARY TABLE bench_favorite_partitioned ({columns}) PARTITION BY HASH (user_id)"))
+    for remainder in range(PARTITIONS):
+        connection.execute(text(
+            f"CREATE TEMPORARY TABLE bench_favorite_p{remainder} PARTITION OF bench_favorite_partitioned "
+            f"FOR VALUES WITH (MODULUS {PARTITIONS}, REMAINDER {remainder})"
+        ))
+    for table in ("bench_favorite_plain", "bench_favorite_partitioned"):
+        connection.execute(text(f"""
+            INSERT INTO {table} (user_id, item_type, item_id)
+            SELECT user_id, 1 + n % 2, n / 2 + 1
+            FROM generate_series(1, :users) AS user_id, generate_series(0, :per_user - 1) AS n
+        """), {"users": users, "per_user": per_user})
+        connection.execute(text(f"ANALYZE {table}"))
+
+
+def compare_layouts(users=2000, per_user=50):
+    url = os.environ["DATABASE_URL"].replace("postgres://", "postgresql://")
+    app = create_app({"SQLALCHEMY_DATABASE_URI": url})
+    with app.app_context(), db.engine.connect() as connection:
+        if connection.dialect.name != "postgresql":
+            sys.exit("--database-url compares the partitioned layout, it needs a Postgres DATABASE_URL")
+        create_layouts(connection, users, per_user)
+
+        user_ids = list(range(1, users + 1, max(1, users // 200)))
+        print(f"{users} users x {per_user} favorites on postgresql, {PARTITIONS} partitions")
+        for table in ("bench_favorite_plain", "bench_favorite_partitioned"):
+            # The repository's two hot statements: listing a user's favorites and removing one
+            select = text(f"SELECT id, item_type, item_id FROM {table} WHERE user_id = :user_id ORDER BY id")
+            delete = text(f"DELETE FROM {table} WHERE id = :id AND user_id = :user_id")
+
+            def list_favorites(user_id):
+                return connection.execute(select, {"user_id": user_id}).all()
+
+            def remove_favorite(user_id):
+                transaction = connection.begin_nested()
+                favorite_id = connection.execute(select, {"user_id": user_id}).first()[0]
+                connection.execute(delete, {"id": favorite_id, "user_id": user_id})
+                transaction.rollback()
+
+            print(f"{table:28} list {timed(list_favorites, user_ids):8.3f} ms  remove {timed(remove_favorite, user_ids):8.3f} ms")
+        plan = connection.execute(text("EXPLAIN SELECT * FROM bench_favorite_partitioned WHERE user_id = 1")).scalars()
+        print("\n".join(plan))
+        connection.rollback()
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:] if not arg.startswith("--")]
+    if "--database-url" in sys.argv:
+        compare_layouts(*args)
+    else:
+        compare_batching(*args)
@@ -0,0 +1,48 @@
+"""Cold start benchmark for create_app().
+
+Every sample runs in a fresh interpreter so import costs are included.
+
+    python benchmarks/startup.py [runs]
+"""
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+PROFILES = {
+    "full": "{'ENABLE_ADMIN': True, 'ENABLE_SWAGGER': True, 'ENABLE_CORS': True, 'ENABLE_MIGRATE': True, 'ENABLE_STATS': True}",
+    "api-only": "{'ENABLE_ADMIN': False, 'ENABLE_SWAGGER': False, 'ENABLE_CORS': False, 'ENABLE_MIGRATE': False, 'ENABLE_STATS': False}",
+}
+
+SNIPPET = """
+import time
+start = time.perf_counter()
+from app import create_app
+create_app({config})
+print(time.perf_counter() - start)
+"""
+
+
+def sample(config):
+    env = dict(os.environ, DATABASE_URL=os.getenv("DATABASE_URL", "sqlite://"))
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", SNIPPET.format(config=config)],
+        cwd=SRC, env=env, check=True, capture_output=True, text=True,
+    ).stdout
+    return time.perf_counter() - started, float(output.strip().splitlines()[-1])
+
+
+def main(runs=10):
+    for name, config in PROFILES.items():
+        samples = [sample(config) for _ in range(runs)]
+        process = statistics.median(total for total, _ in samples) * 1000
+        factory = statistics.median(build for _, build in samples) * 1000
+        print(f"{name:10} process {process:8.1f} ms   import + create_app {factory:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
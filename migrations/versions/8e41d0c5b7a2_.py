@@ -0,0 +1,111 @@
+"""favorite item_type as smallint, hash partitioned by user_id on postgres
+
+Revision ID: 8e41d0c5b7a2
+Revises: 3a7c2e9f41b0
+Create Date: 2026-10-19 16:40:08.532917
+
+"""
+import os
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e41d0c5b7a2'
+down_revision = '3a7c2e9f41b0'
+branch_labels = None
+depends_on = None
+
+# Number of hash partitions on postgres, 0 keeps a plain table
+FAVORITE_PARTITIONS = int(os.getenv('FAVORITE_PARTITIONS', '16'))
+
+# Keep in sync with models.ITEM_TYPE_CODES
+TO_CODE = "CASE item_type WHEN 'character' THEN 1 WHEN 'planet' THEN 2 END"
+TO_NAME = "CASE item_type WHEN 1 THEN 'character' WHEN 2 THEN 'planet' END"
+
+
+def is_partitioned():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return False
+    return bind.execute(sa.text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'favorite'::regclass"
+    )).first() is not None
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql' and FAVORITE_PARTITIONS > 0:
+        # A table cannot be turned into a partitioned one in place: build the new
+        # table next to the old one, copy the rows and swap them
+        op.execute("ALTER TABLE favorite RENAME TO favorite_old")
+        op.execute("ALTER TABLE favorite_old RENAME CONSTRAINT favorite_pkey TO favorite_old_pkey")
+        op.execute("""
+            CREATE TABLE favorite (
+                id INTEGER NOT NULL DEFAULT nextval('favorite_id_seq'),
+                user_id INTEGER NOT NULL REFERENCES "user" (id),
+                item_type SMALLINT NOT NULL,
+                item_id INTEGER NOT NULL,
+                CONSTRAINT favorite_pkey PRIMARY KEY (id, user_id),
+                CONSTRAINT uq_favorite_user_item UNIQUE (user_id, item_type, item_id)
+            ) PARTITION BY HASH (user_id)
+        """)
+        for remainder in range(FAVORITE_PARTITIONS):
+            op.execute(
+                f"CREATE TABLE favorite_p{remainder} PARTITION OF favorite "
+                f"FOR VALUES WITH (MODULUS {FAVORITE_PARTITIONS}, REMAINDER {remainder})"
+            )
+        op.execute(f"""
+            INSERT INTO favorite (id, user_id, item_type, item_id)
+            SELECT DISTINCT ON (user_id, item_type, item_id) id, user_id, {TO_CODE}, item_id
+            FROM favorite_old
+            WHERE item_type IN ('character', 'planet')
+            ORDER BY user_id, item_type, item_id, id
+        """)
+        op.execute("ALTER SEQUENCE favorite_id_seq OWNED BY favorite.id")
+        op.drop_table('favorite_old')
+        return
+
+    with op.batch_alter_table('favorite', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('item_type_code', sa.SmallInteger(), nullable=True))
+    op.execute(f"UPDATE favorite SET item_type_code = {TO_CODE}")
+    op.execute("DELETE FROM favorite WHERE item_type_code IS NULL")
+    op.execute("""
+        DELETE FROM favorite WHERE id NOT IN (
+            SELECT min(id) FROM favorite GROUP BY user_id, item_type_code, item_id
+        )
+    """)
+    with op.batch_alter_table('favorite', schema=None) as batch_op:
+        batch_op.drop_column('item_type')
+        batch_op.alter_column('item_type_code', new_column_name='item_type', existing_type=sa.SmallInteger(), nullable=False)
+    with op.batch_alter_table('favorite', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_favorite_user_item', ['user_id', 'item_type', 'item_id'])
+
+
+def downgrade():
+    if is_partitioned():
+        op.execute("ALTER TABLE favorite RENAME TO favorite_new")
+        op.execute("ALTER TABLE favorite_new RENAME CONSTRAINT favorite_pkey TO favorite_new_pkey")
+        op.execute("""
+            CREATE TABLE favorite (
+                id INTEGER NOT NULL DEFAULT nextval('favorite_id_seq'),
+                user_id INTEGER NOT NULL REFERENCES "user" (id),
+                item_type VARCHAR(50) NOT NULL,
+                item_id INTEGER NOT NULL,
+                CONSTRAINT favorite_pkey PRIMARY KEY (id)
+            )
+        """)
+        op.execute(f"""
+            INSERT INTO favorite (id, user_id, item_type, item_id)
+            SELECT id, user_id, {TO_NAME}, item_id FROM favorite_new
+        """)
+        op.execute("ALTER SEQUENCE favorite_id_seq OWNED BY favorite.id")
+        op.drop_table('favorite_new')
+        return
+
+    with op.batch_alter_table('favorite', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_favorite_user_item', type_='unique')
+        batch_op.add_column(sa.Column('item_type_name', sa.String(length=50), nullable=True))
+    op.execute(f"UPDATE favorite SET item_type_name = {TO_NAME}")
+    with op.batch_alter_table('favorite', schema=None) as batch_op:
+        batch_op.drop_column('item_type')
+        batch_op.alter_column('item_type_name', new_column_name='item_type', existing_type=sa.String(length=50), nullable=False)
@@ -1,7 +1,17 @@
 import os
 from flask_admin import Admin
-from models import db, User, Character, Planet, Favorite, Film
+from models import db, User, Character, Planet, Favorite, Film, ITEM_TYPE_CODES
 from flask_admin.contrib.sqla import ModelView
+from wtforms import SelectField
+
+
+class FavoriteView(ModelView):
+    # Primary key columns are left out of forms, and user_id is one for the mapper
+    form_columns = ['user', 'item_type', 'item_id']
+    # item_type is a custom column type, Flask-Admin cannot build a field for it
+    form_overrides = {'item_type': SelectField}
+    form_args = {'item_type': {'choices': [(name, name) for name in ITEM_TYPE_CODES]}}
+
 
 def setup_admin(app):
     app.secret_key = os.environ.get('FLASK_APP_KEY', 'sample key')
@@ -12,5 +22,5 @@ def setup_admin(app):
     admin.add_view(ModelView(User, db.session))
     admin.add_view(ModelView(Character, db.session))
     admin.add_view(ModelView(Planet, db.session))
-    admin.add_view(ModelView(Favorite, db.session))
+    admin.add_view(FavoriteView(Favorite, db.session))
     admin.add_view(ModelView(Film, db.session))
\ No newline at end of file
@@ -0,0 +1,275 @@
+import json
+import math
+import sys
+import threading
+import time
+from array import array
+from flask import current_app, has_app_context
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+from models import db, Character, Planet, Change
+from changes import changes_since
+
+INT_NULL = -2 ** 63
+
+# Column kinds: numbers live in typed arrays, low cardinality strings are interned
+FLOAT, INT, TEXT, INTERNED = "float", "int", "text", "interned"
+
+CHARACTER_COLUMNS = [
+    ("id", INT), ("name", TEXT), ("height", FLOAT), ("mass", FLOAT),
+    ("hair_color", INTERNED), ("skin_color", INTERNED), ("eye_color", INTERNED),
+    ("birth_year", TEXT), ("gender", INTERNED), ("description", TEXT), ("homeworld_id", INT),
+]
+
+PLANET_COLUMNS = [
+    ("id", INT), ("name", TEXT), ("rotation_period", INT), ("orbital_period", INT),
+    ("diameter", INT), ("climate", INTERNED), ("gravity", INTERNED), ("terrain", INTERNED),
+    ("surface_water", FLOAT), ("population", TEXT), ("description", TEXT),
+]
+
+
+def _encode(kind, value):
+    if kind == FLOAT:
+        return math.nan if value is None else float(value)
+    if kind == INT:
+        return INT_NULL if value is None else int(value)
+    if kind == INTERNED and value is not None:
+        return sys.intern(value)
+    return value
+
+
+def _decode(kind, value):
+    if kind == FLOAT:
+        return None if math.isnan(value) else value
+    if kind == INT:
+        return None if value == INT_NULL else value
+    return value
+
+
+class CatalogTable:
+    """Read-only copy of one model, stored column by column.
+
+    Rows are kept dense: deleting a row moves the last row into its slot.
+    """
+
+    def __init__(self, model, columns):
+        self.model = model
+        self.columns = columns
+        self.lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        self.data = self._empty_columns()
+        self.positions = {}
+        self._listing = None
+
+    def _empty_columns(self):
+        data = {}
+        for name, kind in self.columns:
+            if kind == FLOAT:
+                data[name] = array("d")
+            elif kind == INT:
+                data[name] = array("q")
+            else:
+                data[name] = []
+        return data
+
+    def load(self):
+        """Replace the rows with the database's, readers keep the old copy until the swap."""
+        names = [name for name, _ in self.columns]
+        rows = db.session.query(*[getattr(self.model, name) for name in names]).order_by(self.model.id).all()
+        data = self._empty_columns()
+        positions = {}
+        for position, row in enumerate(rows):
+            for (name, kind), value in zip(self.columns, row):
+                data[name].append(_encode(kind, value))
+            positions[data["id"][position]] = position
+        # Only serialize ahead when the listing is in use, so the first read after the swap is not the slow one
+        listing = None if self._listing is None else self._serialize(data, positions)
+        with self.lock:
+            self.data, self.positions, self._listing = data, positions, listing
+
+    def _put(self, values):
+        position = self.positions.get(values["id"])
+        for name, kind in self.columns:
+            value = _encode(kind, values[name])
+            if position is None:
+                self.data[name].append(value)
+            else:
+                self.data[name][position] = value
+        if position is None:
+            self.positions[values["id"]] = len(self.positions)
+        self._listing = None
+
+    def upsert(self, values):
+        with self.lock:
+            self._put(values)
+
+    def delete(self, row_id):
+        with self.lock:
+            position = self.positions.pop(row_id, None)
+            if position is None:
+                return
+            last = len(self.positions)
+            for name, _ in self.columns:
+                column = self.data[name]
+                column[position] = column[last]
+                column.pop()
+            if position != last:
+                self.positions[self.data["id"][position]] = position
+            self._listing = None
+
+    def _row(self, position, data=None):
+        data = self.data if data is None else data
+        return {name: _decode(kind, data[name][position]) for name, kind in self.columns}
+
+    def _serialize(self, data, positions):
+        rows = [self._row(positions[row_id], data) for row_id in sorted(positions)]
+        # Same output as jsonify: sorted keys, compact separators
+        return json.dumps(rows, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+    def get(self, row_id):
+        with self.lock:
+            position = self.positions.get(row_id)
+            return None if position is None else self._row(position)
+
+    def all(self):
+        with self.lock:
+            return [self._row(self.positions[row_id]) for row_id in sorted(self.positions)]
+
+    def listing(self):
+        """The whole table as a JSON array, serialized once per change of the table."""
+        with self.lock:
+            if self._listing is None:
+                self._listing = self._serialize(self.data, self.positions)
+            return self._listing
+
+    def __len__(self):
+        return len(self.positions)
+
+    def memory_footprint(self):
+        """Approximate bytes held by the table and its cached listing, shared (interned) strings counted once."""
+        seen = set()
+        total = sys.getsizeof(self.positions) + sys.getsizeof(self._listing)
+        for name, kind in self.columns:
+            column = self.data[name]
+            total += sys.getsizeof(column)
+            if kind in (TEXT, INTERNED):
+                for value in column:
+                    if value is not None and id(value) not in seen:
+                        seen.add(id(value))
+                        total += sys.getsizeof(value)
+        return total
+
+
+class Catalog:
+    """In-memory read engine for /people and /planets.
+
+    Loaded once, then kept current with the changes committed through the
+    SQLAlchemy session of this process. Every `reload_seconds` it catches up
+    with the changes committed by other processes: from the change feed when
+    `follow_changes` is set, with a full reload otherwise.
+    """
+
+    def __init__(self, reload_seconds=60, follow_changes=False):
+        self.people = CatalogTable(Character, CHARACTER_COLUMNS)
+        self.planets = CatalogTable(Planet, PLANET_COLUMNS)
+        self.tables = {Character: self.people, Planet: self.planets}
+        self.feed_tables = {"character": self.people, "planet": self.planets}
+        self.reload_seconds = reload_seconds
+        self.follow_changes = follow_changes
+        self.version = 0
+        self.loaded_at = None
+        self.refreshed_at = None
+        self.refresh_lock = threading.Lock()
+
+    def load(self):
+        # Read the feed position first: changes committed while the rows are
+        # read are applied again by the next refresh, which is harmless
+        version = 0
+        if self.follow_changes:
+            version = db.session.query(func.max(Change.version)).scalar() or 0
+        for table in self.tables.values():
+            table.load()
+        self.version = version
+        self.loaded_at = self.refreshed_at = time.monotonic()
+
+    def refresh(self):
+        if not self.follow_changes:
+            self.load()
+            return
+        has_more = True
+        while has_more:
+            changes, self.version, has_more = changes_since(self.version, 1000, list(self.feed_tables))
+            for change in changes:
+                table = self.feed_tables[change["table"]]
+                if change["operation"] == "delete":
+                    table.delete(change["id"])
+                else:
+                    table.upsert(change["data"])
+        self.refreshed_at = time.monotonic()
+
+    def ensure_fresh(self):
+        if self.loaded_at is None:
+            with self.refresh_lock:
+                if self.loaded_at is None:
+                    self.load()
+        elif self.reload_seconds and time.monotonic() - self.refreshed_at > self.reload_seconds:
+            # One request refreshes, the others keep serving the current copy meanwhile
+            if self.refresh_lock.acquire(blocking=False):
+                try:
+                    if time.monotonic() - self.refreshed_at > self.reload_seconds:
+                        self.refresh()
+                finally:
+                    self.refresh_lock.release()
+        return self
+
+    def apply(self, changes):
+        for model, operation, values in changes:
+            table = self.tables[model]
+            if operation == "delete":
+                table.delete(values)
+            else:
+                table.upsert(values)
+
+    def memory_footprint(self):
+        return {
+            "people": {"rows": len(self.people), "bytes": self.people.memory_footprint()},
+            "planets": {"rows": len(self.planets), "bytes": self.planets.memory_footprint()},
+        }
+
+
+def _collect_changes(session, flush_context):
+    changes = session.info.setdefault("catalog_changes", [])
+    for obj in list(session.new) + list(session.dirty):
+        if type(obj) in (Character, Planet):
+            columns = CHARACTER_COLUMNS if type(obj) is Character else PLANET_COLUMNS
+            changes.append((type(obj), "upsert", {name: getattr(obj, name) for name, _ in columns}))
+    for obj in session.deleted:
+        if type(obj) in (Character, Planet):
+            changes.append((type(obj), "delete", obj.id))
+
+
+def _apply_changes(session):
+    changes = session.info.pop("catalog_changes", None)
+    if changes and has_app_context():
+        catalog = current_app.extensions.get("catalog")
+        if catalog is not None and catalog.loaded_at is not None:
+            catalog.apply(changes)
+
+
+def _discard_changes(session):
+    session.info.pop("catalog_changes", None)
+
+
+def init_catalog(app):
+    catalog = Catalog(
+        reload_seconds=app.config.get("CATALOG_RELOAD_SECONDS", 60),
+        follow_changes=bool(app.config.get("ENABLE_CHANGES")),
+    )
+    app.extensions["catalog"] = catalog
+    if not event.contains(Session, "after_flush", _collect_changes):
+        event.listen(Session, "after_flush", _collect_changes)
+        event.listen(Session, "after_commit", _apply_changes)
+        event.listen(Session, "after_rollback", _discard_changes)
+    return catalog
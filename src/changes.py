@@ -0,0 +1,123 @@
+import json
+import time
+import click
+from flask import current_app, has_app_context
+from sqlalchemy import bindparam, event, func, insert, delete, select, update
+from sqlalchemy.orm import Session
+from models import db, User, Character, Planet, Film, Favorite, Change, ChangeVersion
+
+TRACKED = {User: "user", Character: "character", Planet: "planet", Film: "film", Favorite: "favorite"}
+
+
+def _record_changes(session, flush_context):
+    """Write one change row per inserted, updated or deleted object, in the same transaction."""
+    if not (has_app_context() and current_app.config.get("ENABLE_CHANGES")):
+        return
+
+    rows = []
+    for operation, objects in (("insert", session.new), ("update", session.dirty), ("delete", session.deleted)):
+        for obj in objects:
+            table_name = TRACKED.get(type(obj))
+            if table_name is None:
+                continue
+            if operation == "update" and not session.is_modified(obj, include_collections=False):
+                continue
+            rows.append({
+                "table_name": table_name,
+                "row_id": obj.id,
+                "operation": operation,
+                "data": None if operation == "delete" else obj.serialize(),
+            })
+    if rows:
+        ids = session.connection().execute(insert(Change).returning(Change.id), rows).scalars()
+        session.info.setdefault("change_ids", []).extend(ids)
+
+
+def _assign_versions(session):
+    """Number this transaction's changes right before it commits.
+
+    Ids come from a sequence when the rows are inserted, so a transaction that
+    started earlier can commit after a later one: a client reading in between
+    would move past the earlier ids and never see them. Versions are instead
+    taken from the change_version row, whose lock is held until the commit, so
+    they become visible in order.
+    """
+    session.flush()
+    ids = session.info.pop("change_ids", None)
+    if not ids:
+        return
+
+    connection = session.connection()
+    counter = ChangeVersion.__table__
+    bumped = connection.execute(
+        update(counter).where(counter.c.id == 1).values(version=counter.c.version + len(ids))
+    )
+    if bumped.rowcount == 0:
+        # Tables created with create_all instead of the migrations
+        connection.execute(insert(counter).values(id=1, version=len(ids)))
+    last = connection.execute(select(counter.c.version).where(counter.c.id == 1)).scalar_one()
+
+    connection.execute(
+        update(Change.__table__).where(Change.__table__.c.id == bindparam("change_id")).values(version=bindparam("new_version")),
+        [{"change_id": change_id, "new_version": last - len(ids) + position + 1} for position, change_id in enumerate(sorted(ids))],
+    )
+
+
+def _discard_versions(session):
+    session.info.pop("change_ids", None)
+
+
+def changes_since(since, limit, tables=None):
+    """Changes after version `since`, keeping only the latest change per row.
+
+    Returns the changes and the version to ask for next time.
+    """
+    query = Change.query.filter(Change.version > since)
+    if tables:
+        query = query.filter(Change.table_name.in_(tables))
+    page = query.order_by(Change.version).limit(limit).all()
+
+    latest = {}
+    for change in page:
+        latest.pop((change.table_name, change.row_id), None)
+        latest[(change.table_name, change.row_id)] = change
+    version = page[-1].version if page else since
+    return [change.serialize() for change in latest.values()], version, len(page) == limit
+
+
+def compact_changes():
+    """Drop every change that a later change of the same row supersedes."""
+    latest = select(func.max(Change.version)).where(Change.version.isnot(None)).group_by(Change.table_name, Change.row_id)
+    result = db.session.execute(delete(Change).where(Change.version.not_in(latest.scalar_subquery())))
+    db.session.commit()
+    return result.rowcount
+
+
+def stream_changes(since, tables=None, poll_seconds=1.0, max_seconds=30.0):
+    """Server-Sent Events, the client reconnects with Last-Event-ID when it ends."""
+    deadline = time.monotonic() + max_seconds
+    yield "retry: 1000\n\n"
+    while time.monotonic() < deadline:
+        changes, version, has_more = changes_since(since, 500, tables)
+        db.session.remove()
+        for change in changes:
+            yield f"id: {change['version']}\nevent: change\ndata: {json.dumps(change)}\n\n"
+        if version == since:
+            yield ": keep-alive\n\n"
+        since = version
+        if not has_more:
+            time.sleep(poll_seconds)
+
+
+@click.command("compact-changes")
+def compact_changes_command():
+    """Compact the change feed log, run it from a scheduled job."""
+    click.echo(f"Removed {compact_changes()} superseded changes")
+
+
+def init_changes(app):
+    if not event.contains(Session, "after_flush", _record_changes):
+        event.listen(Session, "after_flush", _record_changes)
+        event.listen(Session, "before_commit", _assign_versions)
+        event.listen(Session, "after_rollback", _discard_versions)
+    app.cli.add_command(compact_changes_command)
@@ -0,0 +1,67 @@
+from sqlalchemy.exc import IntegrityError
+from models import db, Favorite, Character, Planet
+
+ITEM_MODELS = {'character': Character, 'planet': Planet}
+
+
+class FavoriteAlreadyExists(Exception):
+    pass
+
+
+class FavoriteRepository:
+    """Every favorite query goes through here and is keyed by the owner's user_id.
+
+    With the partitioned layout, Postgres prunes the other partitions and each
+    request only touches the user's own partition. The (user_id, item_type,
+    item_id) unique index answers the lookups.
+    """
+
+    def __init__(self, session=None):
+        self.session = session or db.session
+
+    def for_user(self, user_id):
+        return self.session.query(Favorite).filter(Favorite.user_id == user_id).order_by(Favorite.id).all()
+
+    def get(self, user_id, item_type, item_id):
+        return self.session.query(Favorite).filter(
+            Favorite.user_id == user_id,
+            Favorite.item_type == item_type,
+            Favorite.item_id == item_id,
+        ).one_or_none()
+
+    def add(self, user_id, item_type, item_id):
+        favorite = Favorite(user_id=user_id, item_type=item_type, item_id=item_id)
+        self.session.add(favorite)
+        try:
+            self.session.commit()
+        except IntegrityError:
+            # Lost a race with an identical request, the unique index caught it
+            self.session.rollback()
+            raise FavoriteAlreadyExists()
+        return favorite
+
+    def remove(self, favorite):
+        self.session.delete(favorite)
+        self.session.commit()
+
+    def items_for_user(self, user_id):
+        """The user's favorites with their items, one query per item type instead of one per favorite."""
+        favorites = self.for_user(user_id)
+
+        items = {}
+        for item_type, model in ITEM_MODELS.items():
+            ids = {fav.item_id for fav in favorites if fav.item_type == item_type}
+            if ids:
+                for item in self.session.query(model).filter(model.id.in_(ids)):
+                    items[(item_type, item.id)] = item
+
+        result = []
+        for fav in favorites:
+            item = items.get((fav.item_type, fav.item_id))
+            if item is not None:
+                result.append({
+                    "id": fav.id,
+                    "type": fav.item_type,
+                    "item": item.serialize()
+                })
+        return result
@@ -1,5 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import Column, ForeignKey, Integer, String, Float, DateTime, Text, Boolean, Table
+from sqlalchemy import Column, ForeignKey, Integer, String, Float, DateTime, Text, Boolean, Table, SmallInteger
+from sqlalchemy.types import TypeDecorator
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -40,14 +41,41 @@ class User(db.Model):
             "is_active": self.is_active
         }
 
+# Favorite item types are stored as a smallint, the API keeps using the names
+ITEM_TYPE_CODES = {'character': 1, 'planet': 2}
+ITEM_TYPE_NAMES = {code: name for name, code in ITEM_TYPE_CODES.items()}
+
+class ItemType(TypeDecorator):
+    impl = SmallInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if value not in ITEM_TYPE_CODES:
+            raise ValueError(f"Unknown favorite item type: {value}")
+        return ITEM_TYPE_CODES[value]
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else ITEM_TYPE_NAMES[value]
+
 class Favorite(db.Model):
+    # On Postgres the table is hash partitioned by user_id (see the migrations),
+    # query it through favorites.FavoriteRepository so every query names the user
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    item_type = db.Column(db.String(50), nullable=False)  # 'character' or 'planet'
+    item_type = db.Column(ItemType, nullable=False)  # 'character' or 'planet'
     item_id = db.Column(db.Integer, nullable=False)
     
     user = db.relationship("User", back_populates="favorites")
 
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'item_type', 'item_id', name='uq_favorite_user_item'),
+    )
+    # user_id is part of the identity so UPDATE and DELETE (cascades included)
+    # filter on the partition key and Postgres only touches one partition
+    __mapper_args__ = {"primary_key": [id, user_id]}
+
     def __repr__(self):
         return f"<Favorite {self.item_type}:{self.item_id} by User {self.user_id}>"
     
@@ -153,3 +181,39 @@ class Film(db.Model):
             "producer": self.producer,
             "release_date": self.release_date.strftime("%Y-%m-%d") if self.release_date else None
         }
+
+class Change(db.Model):
+    __tablename__ = 'change'
+
+    id = db.Column(db.Integer, primary_key=True)
+    # Assigned at commit, in commit order (see changes.py), NULL until then
+    version = db.Column(db.BigInteger, nullable=True, unique=True)
+    table_name = db.Column(db.String(50), nullable=False)
+    row_id = db.Column(db.Integer, nullable=False)
+    operation = db.Column(db.String(10), nullable=False)  # 'insert', 'update' or 'delete'
+    data = db.Column(db.JSON, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_change_table_row', 'table_name', 'row_id'),
+        db.Index('ix_change_table_version', 'table_name', 'version'),
+    )
+
+    def __repr__(self):
+        return f'<Change {self.version} {self.operation} {self.table_name}:{self.row_id}>'
+
+    def serialize(self):
+        return {
+            "version": self.version,
+            "table": self.table_name,
+            "id": self.row_id,
+            "operation": self.operation,
+            "data": self.data
+        }
+
+class ChangeVersion(db.Model):
+    """Single row holding the last change feed version handed out."""
+    __tablename__ = 'change_version'
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
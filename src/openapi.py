@@ -0,0 +1,138 @@
+import hashlib
+import json
+import re
+import sys
+from functools import wraps
+import fastjsonschema
+from flask import Response, g, request
+from utils import APIException
+
+CONVERTER_TYPES = {
+    "int": {"type": "integer"},
+    "float": {"type": "number"},
+    "default": {"type": "string"},
+    "string": {"type": "string"},
+    "path": {"type": "string"},
+}
+
+SKIPPED_ENDPOINTS = ("static", "openapi_spec")
+
+
+def validate_body(schema):
+    """Validate the JSON body against `schema`, the validator is compiled once here.
+
+    An empty body is validated as `{}`, any other body must be JSON. The valid
+    body is available as `g.body` and the schema is documented as the request
+    body in the OpenAPI document.
+    """
+    validator = fastjsonschema.compile(schema)
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not request.get_data(cache=True).strip():
+                body = {}
+            else:
+                body = request.get_json(silent=True) if request.is_json else None
+                if body is None:
+                    raise APIException("Request body must be JSON with Content-Type: application/json", status_code=400)
+            try:
+                g.body = validator(body)
+            except fastjsonschema.JsonSchemaException as error:
+                raise APIException("Invalid request body", status_code=400, payload={"error": error.message})
+            return fn(*args, **kwargs)
+        wrapper.request_schema = schema
+        return wrapper
+    return decorator
+
+
+def _path_and_parameters(rule):
+    parameters = []
+    path = rule.rule
+    for converter, _, name in re.findall(r"<(?:(\w+)(\(.*?\))?:)?(\w+)>", rule.rule):
+        parameters.append({
+            "name": name,
+            "in": "path",
+            "required": True,
+            "schema": CONVERTER_TYPES.get(converter or "default", {"type": "string"}),
+        })
+    path = re.sub(r"<(?:\w+(?:\(.*?\))?:)?(\w+)>", r"{\1}", path)
+    return path, parameters
+
+
+def _operation(endpoint, view):
+    doc = (view.__doc__ or "").strip()
+    operation = {
+        "operationId": endpoint.replace(".", "_"),
+        "summary": doc.splitlines()[0] if doc else endpoint.split(".")[-1].replace("_", " ").capitalize(),
+        "responses": {"default": {"description": "JSON response"}},
+    }
+    schema = getattr(view, "request_schema", None)
+    if schema is not None:
+        operation["requestBody"] = {
+            "required": False,
+            "content": {"application/json": {"schema": schema}},
+        }
+    return operation
+
+
+def build_spec(app, title="StarWars Blog API", version="1.0.0"):
+    paths = {}
+    for rule in app.url_map.iter_rules():
+        if rule.endpoint in SKIPPED_ENDPOINTS or rule.endpoint.startswith("admin") or "/admin/" in rule.rule:
+            continue
+        path, parameters = _path_and_parameters(rule)
+        item = paths.setdefault(path, {})
+        if parameters:
+            item["parameters"] = parameters
+        view = app.view_functions[rule.endpoint]
+        for method in sorted(rule.methods - {"HEAD", "OPTIONS"}):
+            item[method.lower()] = _operation(rule.endpoint, view)
+
+    return {
+        "openapi": "3.0.3",
+        "info": {"title": title, "version": version},
+        "paths": dict(sorted(paths.items())),
+    }
+
+
+class OpenAPIDocument:
+    """The OpenAPI document serialized once, served as bytes with an ETag."""
+
+    def __init__(self, body):
+        self.body = body
+        self.etag = hashlib.sha256(body).hexdigest()
+
+    @classmethod
+    def from_app(cls, app):
+        return cls(json.dumps(build_spec(app), sort_keys=True).encode("utf-8"))
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, "rb") as spec_file:
+            return cls(spec_file.read())
+
+    def response(self):
+        response = Response(self.body, mimetype="application/json")
+        response.set_etag(self.etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response.make_conditional(request)
+
+
+def init_openapi(app):
+    """Register /openapi.json, call it once every route is registered."""
+    spec_file = app.config.get("OPENAPI_SPEC_FILE")
+    if spec_file:
+        document = OpenAPIDocument.from_file(spec_file)
+    else:
+        document = OpenAPIDocument.from_app(app)
+    app.extensions["openapi"] = document
+    app.add_url_rule("/openapi.json", "openapi_spec", document.response)
+    return document
+
+
+if __name__ == "__main__":
+    # Build artifact: python openapi.py > openapi.json, then set OPENAPI_SPEC_FILE
+    from app import create_app
+    app = create_app()
+    sys.stdout.buffer.write(OpenAPIDocument.from_app(app).body)
@@ -0,0 +1,252 @@
+import atexit
+import cProfile
+import hashlib
+import hmac
+import io
+import itertools
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+import click
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from models import db
+
+SIGNATURE_HEADER = "X-Profile-Signature"
+# Longest a signature may stay valid, each one profiles a single request
+MAX_SIGNATURE_TTL = 900
+
+# Only one cProfile profiler can be active per process (sys.monitoring on 3.12+)
+_cprofile_lock = threading.Lock()
+
+
+def sign(secret, method, path, ttl=300):
+    """Header value that allows profiling one `method path` request in the next `ttl` seconds."""
+    if not 0 < ttl <= MAX_SIGNATURE_TTL:
+        raise ValueError(f"ttl must be between 1 and {MAX_SIGNATURE_TTL} seconds")
+    expires = int(time.time()) + ttl
+    digest = hmac.new(secret.encode(), f"{expires}:{method} {path}".encode(), hashlib.sha256).hexdigest()
+    return f"{expires}:{digest}"
+
+
+def verify(secret, value, method, path):
+    expires, _, digest = value.partition(":")
+    if not expires.isdigit() or not time.time() <= int(expires) <= time.time() + MAX_SIGNATURE_TTL:
+        return False
+    expected = hmac.new(secret.encode(), f"{expires}:{method} {path}".encode(), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, digest)
+
+
+class StackSampler:
+    """Samples one thread's stack every `interval` seconds into collapsed stacks."""
+
+    def __init__(self, thread_id, stacks, interval=0.001):
+        self.thread_id = thread_id
+        self.stacks = stacks
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+
+class Profiler:
+    """Profiles single signed requests with cProfile and 1-in-N requests with a stack sampler.
+
+    Sampled stacks are written to disk every `flush_seconds` and at exit.
+    """
+
+    def __init__(self, directory, secret=None, sample_rate=0, interval=0.001, flush_seconds=30):
+        self.directory = directory
+        self.secret = secret
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.flush_seconds = flush_seconds
+        self.counter = itertools.count(1)
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.stacks = Counter()
+        self.dirty = False
+        self.flusher_pid = None
+        # Signatures already used in this process, until they expire
+        self.used_signatures = {}
+        os.makedirs(directory, exist_ok=True)
+        atexit.register(self.flush)
+
+    def before_request(self):
+        signature = request.headers.get(SIGNATURE_HEADER)
+        if signature and self.secret and verify(self.secret, signature, request.method, request.path):
+            # A signed request arriving while another one is profiled runs unprofiled
+            if not _cprofile_lock.acquire(blocking=False):
+                g.profile_skipped = "another request is being profiled"
+                return
+            if not self.claim(signature):
+                _cprofile_lock.release()
+                g.profile_skipped = "signature already used"
+                return
+            g.profile = cProfile.Profile()
+            g.profile_queries = []
+            try:
+                g.profile.enable()
+            except ValueError:
+                # Another tool (a debugger, coverage) holds the profiler slot
+                g.pop("profile")
+                _cprofile_lock.release()
+                g.profile_skipped = "another profiler is active"
+        elif self.sample_rate and next(self.counter) % self.sample_rate == 0:
+            g.sampler = StackSampler(threading.get_ident(), Counter(), self.interval)
+            g.sampler.start()
+
+    def after_request(self, response):
+        profile = g.pop("profile", None)
+        if profile is not None:
+            profile.disable()
+            _cprofile_lock.release()
+            response.headers["X-Profile-Id"] = self.store(profile, g.pop("profile_queries"))
+        elif "profile_skipped" in g:
+            response.headers["X-Profile-Skipped"] = g.pop("profile_skipped")
+        sampler = g.pop("sampler", None)
+        if sampler is not None:
+            sampler.stop()
+            with self.lock:
+                self.stacks.update(sampler.stacks)
+                self.dirty = True
+            self.start_flusher()
+        return response
+
+    def claim(self, signature):
+        """True the first time this process sees `signature`, so each one profiles a single request."""
+        now = time.time()
+        with self.lock:
+            self.used_signatures = {used: expires for used, expires in self.used_signatures.items() if expires >= now}
+            if signature in self.used_signatures:
+                return False
+            self.used_signatures[signature] = int(signature.partition(":")[0])
+            return True
+
+    def teardown_request(self, error):
+        # after_request is skipped when the view raises, never leave a profiler running
+        profile = g.pop("profile", None)
+        if profile is not None:
+            profile.disable()
+            _cprofile_lock.release()
+        sampler = g.pop("sampler", None)
+        if sampler is not None:
+            sampler.stop()
+
+    def start_flusher(self):
+        # Started on the first sample so that each forked worker gets its own thread
+        with self.lock:
+            if self.flusher_pid == os.getpid():
+                return
+            self.flusher_pid = os.getpid()
+        threading.Thread(target=self.run_flusher, daemon=True).start()
+
+    def run_flusher(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            self.flush()
+
+    def flush(self):
+        # flush_lock keeps an older snapshot from overwriting a newer one
+        with self.flush_lock:
+            with self.lock:
+                if not self.dirty:
+                    return
+                stacks = self.stacks.most_common()
+                self.dirty = False
+            self.write_stacks(stacks)
+
+    def store(self, profile, queries):
+        profile_id = f"{int(time.time())}-{uuid.uuid4().hex[:8]}"
+        base = os.path.join(self.directory, profile_id)
+        profile.dump_stats(base + ".prof")
+
+        summary = io.StringIO()
+        pstats.Stats(profile, stream=summary).sort_stats("cumulative").print_stats(40)
+        with open(base + ".txt", "w") as summary_file:
+            summary_file.write(f"{request.method} {request.full_path}\n\n")
+            summary_file.write(summary.getvalue())
+        with open(base + ".sql.json", "w") as sql_file:
+            json.dump({
+                "total_ms": sum(query["ms"] for query in queries),
+                "count": len(queries),
+                "queries": queries,
+            }, sql_file, indent=2)
+        return profile_id
+
+    def write_stacks(self, stacks):
+        # Collapsed stacks, the input format of flamegraph.pl and speedscope
+        path = os.path.join(self.directory, f"stacks-{os.getpid()}.folded")
+        with open(path, "w") as stacks_file:
+            for stack, count in stacks:
+                stacks_file.write(f"{stack} {count}\n")
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["profile_started"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    queries = g.get("profile_queries") if has_app_context() else None
+    if queries is not None:
+        queries.append({"sql": statement, "ms": (time.perf_counter() - conn.info["profile_started"]) * 1000})
+
+
+@click.command("profile-sign")
+@click.argument("method")
+@click.argument("path")
+@click.option("--ttl", default=300, type=click.IntRange(1, MAX_SIGNATURE_TTL),
+              help=f"Seconds the signature stays valid, at most {MAX_SIGNATURE_TTL}.")
+def profile_sign_command(method, path, ttl):
+    """Print the header that profiles a single request to METHOD PATH."""
+    secret = current_app.config.get("PROFILING_SECRET")
+    if not secret:
+        raise click.ClickException("PROFILING_SECRET is not set")
+    click.echo(f"{SIGNATURE_HEADER}: {sign(secret, method.upper(), path, ttl)}")
+
+
+def init_profiling(app):
+    """Hooks are only installed when a profiling mode is configured, otherwise there is no overhead."""
+    app.cli.add_command(profile_sign_command)
+    secret = app.config.get("PROFILING_SECRET")
+    sample_rate = app.config.get("PROFILE_SAMPLE_RATE", 0)
+    if not secret and not sample_rate:
+        return None
+
+    profiler = Profiler(
+        app.config.get("PROFILE_DIR") or os.path.join(app.instance_path, "profiles"),
+        secret=secret,
+        sample_rate=sample_rate,
+        flush_seconds=app.config.get("PROFILE_FLUSH_SECONDS", 30),
+    )
+    app.before_request(profiler.before_request)
+    app.after_request(profiler.after_request)
+    app.teardown_request(profiler.teardown_request)
+    with app.app_context():
+        if not event.contains(db.engine, "before_cursor_execute", _before_cursor_execute):
+            event.listen(db.engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(db.engine, "after_cursor_execute", _after_cursor_execute)
+    app.extensions["profiler"] = profiler
+    return profiler
@@ -1,8 +1,9 @@
-from app import app, db
+from app import create_app, db
 from models import User, Character, Planet, Favorite, Film
 from datetime import datetime
 
 def seed_database():
+    app = create_app()
     with app.app_context():
         db.drop_all()
         db.create_all()
@@ -0,0 +1,207 @@
+import threading
+import time
+import numpy as np
+from flask import current_app, has_app_context
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+from models import db, Character, Planet, Change
+from changes import TRACKED
+
+PERCENTILES = (25, 50, 75, 90)
+# Group label for rows where the grouping column is NULL
+UNKNOWN = "unknown"
+
+
+class TableVersions:
+    """Counts the commits that touched each model in this process."""
+
+    def __init__(self, models):
+        self.lock = threading.Lock()
+        self.versions = {model: 0 for model in models}
+
+    def bump(self, models):
+        with self.lock:
+            for model in models:
+                self.versions[model] += 1
+
+    def get(self, *models):
+        return tuple(self.versions[model] for model in models)
+
+
+table_versions = TableVersions([Character, Planet])
+
+
+class FeedVersions:
+    """Latest change feed version of each model, shared by every process."""
+
+    def get(self, *models):
+        names = [TRACKED[model] for model in models]
+        latest = dict(
+            db.session.query(Change.table_name, func.max(Change.version))
+            .filter(Change.table_name.in_(names))
+            .group_by(Change.table_name)
+            .all()
+        )
+        return tuple(latest.get(name) for name in names)
+
+
+def _collect_touched(session, flush_context):
+    touched = session.info.setdefault("stats_touched", set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if type(obj) in table_versions.versions:
+            touched.add(type(obj))
+
+
+def _bump_touched(session):
+    touched = session.info.pop("stats_touched", None)
+    if touched:
+        table_versions.bump(touched)
+
+
+def _discard_touched(session):
+    session.info.pop("stats_touched", None)
+
+
+class StatsCache:
+    """Keeps each result until one of its tables changes or it is `max_age` seconds old.
+
+    With per-process `TableVersions` the age limit covers writes committed by
+    other processes, `FeedVersions` see those too.
+    """
+
+    def __init__(self, max_age=300, versions=table_versions):
+        self.max_age = max_age
+        self.versions = versions
+        self.lock = threading.Lock()
+        self.entries = {}
+
+    def get(self, key, models, compute):
+        version = self.versions.get(*models)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is not None and entry[0] == version and now - entry[1] < self.max_age:
+            return entry[2]
+        result = compute()
+        with self.lock:
+            self.entries[key] = (version, now, result)
+        return result
+
+
+def _catalog():
+    if has_app_context():
+        catalog = current_app.extensions.get("catalog")
+        if catalog is not None:
+            return catalog.ensure_fresh()
+    return None
+
+
+def _snapshot(model, group_column, numeric_columns):
+    """Group labels and float64 arrays of the numeric columns (NULL as NaN)."""
+    catalog = _catalog()
+    if catalog is not None:
+        from catalog import INT, INT_NULL
+        table = catalog.tables[model]
+        with table.lock:
+            labels = [label or UNKNOWN for label in table.data[group_column]]
+            columns = {name: np.array(table.data[name], dtype=np.float64) for name in numeric_columns}
+        for name, kind in table.columns:
+            if name in columns and kind == INT:
+                columns[name][columns[name] == INT_NULL] = np.nan
+        return np.array(labels, dtype=object), columns
+
+    query_columns = [getattr(model, name) for name in [group_column] + list(numeric_columns)]
+    rows = db.session.query(*query_columns).all()
+    labels = np.array([row[0] or UNKNOWN for row in rows], dtype=object)
+    columns = {
+        name: np.array([row[index + 1] for row in rows], dtype=np.float64)
+        for index, name in enumerate(numeric_columns)
+    }
+    return labels, columns
+
+
+def _histograms(labels, values, bins):
+    finite = ~np.isnan(values)
+    if not finite.any():
+        return {"bins": [], "groups": {}}
+    edges = np.histogram_bin_edges(values[finite], bins=bins)
+    groups = {}
+    for label in sorted(set(labels[finite])):
+        counts, _ = np.histogram(values[finite & (labels == label)], bins=edges)
+        groups[label] = counts.tolist()
+    return {"bins": edges.tolist(), "groups": groups}
+
+
+def _percentiles(values):
+    values = values[~np.isnan(values)]
+    if values.size == 0:
+        return None
+    return {f"p{p}": float(value) for p, value in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+
+
+def people_stats(bins=10):
+    # Counts and averages are pushed to the database as one GROUP BY
+    aggregates = db.session.query(
+        Character.gender,
+        func.count(Character.id),
+        func.avg(Character.height), func.min(Character.height), func.max(Character.height),
+        func.avg(Character.mass), func.min(Character.mass), func.max(Character.mass),
+    ).group_by(Character.gender).all()
+
+    by_gender = {}
+    for gender, count, h_avg, h_min, h_max, m_avg, m_min, m_max in aggregates:
+        by_gender[gender or UNKNOWN] = {
+            "count": count,
+            "height": {"avg": h_avg, "min": h_min, "max": h_max},
+            "mass": {"avg": m_avg, "min": m_min, "max": m_max},
+        }
+
+    # Histograms need the raw values, computed over a columnar snapshot
+    genders, columns = _snapshot(Character, "gender", ("height", "mass"))
+    return {
+        "count": int(genders.size),
+        "by_gender": by_gender,
+        "histograms": {name: _histograms(genders, values, bins) for name, values in columns.items()},
+    }
+
+
+def planets_stats():
+    residents = db.session.query(
+        Character.homeworld_id.label("planet_id"), func.count(Character.id).label("residents")
+    ).filter(Character.homeworld_id.isnot(None)).group_by(Character.homeworld_id).subquery()
+    planet_count, resident_count = db.session.query(
+        func.count(Planet.id), func.coalesce(func.sum(residents.c.residents), 0)
+    ).outerjoin(residents, residents.c.planet_id == Planet.id).one()
+
+    climates, columns = _snapshot(Planet, "climate", ("diameter", "surface_water"))
+    by_climate = {}
+    for climate in sorted(set(climates)):
+        mask = climates == climate
+        by_climate[climate] = {
+            "count": int(mask.sum()),
+            **{name: _percentiles(values[mask]) for name, values in columns.items()},
+        }
+
+    return {
+        "count": planet_count,
+        "by_climate": by_climate,
+        "residents_per_planet": {
+            "planets": planet_count,
+            "residents": int(resident_count),
+            "avg": resident_count / planet_count if planet_count else None,
+        },
+    }
+
+
+def init_stats(app):
+    max_age = app.config.get("STATS_CACHE_SECONDS", 300)
+    if app.config.get("ENABLE_CHANGES"):
+        app.extensions["stats_cache"] = StatsCache(max_age=max_age, versions=FeedVersions())
+        return app.extensions["stats_cache"]
+
+    app.extensions["stats_cache"] = StatsCache(max_age=max_age)
+    if not event.contains(Session, "after_flush", _collect_touched):
+        event.listen(Session, "after_flush", _collect_touched)
+        event.listen(Session, "after_commit", _bump_touched)
+        event.listen(Session, "after_rollback", _discard_touched)
+    return app.extensions["stats_cache"]
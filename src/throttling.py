@@ -0,0 +1,233 @@
+import math
+import threading
+import time
+from functools import wraps
+from flask import current_app, request, jsonify, make_response
+
+
+class SingleFlight:
+    """Lets concurrent identical calls share one execution.
+
+    The first caller for a key runs the function, every caller that arrives
+    while it is still running waits and gets the same result.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {"done": threading.Event(), "result": None, "error": None}
+                self._calls[key] = call
+
+        if not leader:
+            call["done"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"]
+
+        try:
+            call["result"] = fn()
+        except Exception as error:
+            call["error"] = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call["done"].set()
+        return call["result"]
+
+
+class MemoryBucketBackend:
+    """Token buckets stored in this process.
+
+    A bucket that has refilled completely is the same as a missing one, so
+    those are dropped every `sweep_interval` seconds to keep memory bounded.
+    """
+
+    clock = staticmethod(time.monotonic)
+
+    def __init__(self, sweep_interval=60):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self.sweep_interval = sweep_interval
+        self._swept_at = None
+
+    def take(self, key, capacity, refill_rate, now):
+        with self._lock:
+            if self._swept_at is None or now - self._swept_at >= self.sweep_interval:
+                self._sweep(now)
+            tokens, updated_at, _ = self._buckets.get(key, (capacity, now, now))
+            tokens, retry_after = _refill_and_take(tokens, updated_at, capacity, refill_rate, now)
+            self._buckets[key] = (tokens, now, now + _seconds_to_full(tokens, capacity, refill_rate))
+            return retry_after
+
+    def _sweep(self, now):
+        self._buckets = {key: bucket for key, bucket in self._buckets.items() if bucket[2] > now}
+        self._swept_at = now
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class LocalSharedStore:
+    """In-process stand-in for RedisStore, used by the tests.
+
+    It only exposes the two operations SharedBucketBackend relies on.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+
+    def get(self, key):
+        with self._lock:
+            return self._live(key)
+
+    def compare_and_set(self, key, expected, value, ttl):
+        with self._lock:
+            if self._live(key) != expected:
+                return False
+            self._data[key] = (value, time.time() + ttl)
+            return True
+
+    def _live(self, key):
+        value, expires_at = self._data.get(key, (None, None))
+        if expires_at is not None and expires_at <= time.time():
+            del self._data[key]
+            return None
+        return value
+
+
+class RedisStore:
+    """get/compare_and_set on Redis, shared by every worker and host."""
+
+    def __init__(self, url):
+        import redis
+        self.redis = redis
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def compare_and_set(self, key, expected, value, ttl):
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(key)
+                if pipe.get(key) != expected:
+                    pipe.unwatch()
+                    return False
+                pipe.multi()
+                pipe.set(key, value, ex=ttl)
+                pipe.execute()
+                return True
+            except self.redis.WatchError:
+                return False
+
+
+class SharedBucketBackend:
+    """Token buckets kept in a store shared by every worker."""
+
+    # Bucket timestamps are compared across hosts, a monotonic clock is per host
+    clock = staticmethod(time.time)
+
+    def __init__(self, store, prefix="ratelimit:"):
+        self.store = store
+        self.prefix = prefix
+
+    def take(self, key, capacity, refill_rate, now):
+        key = self.prefix + key
+        while True:
+            current = self.store.get(key)
+            if current is None:
+                tokens, updated_at = capacity, now
+            else:
+                tokens, updated_at = (float(part) for part in current.split(":"))
+            tokens, retry_after = _refill_and_take(tokens, updated_at, capacity, refill_rate, now)
+            # Expire the bucket once it would be full again, it is then the same as a new one
+            ttl = max(1, math.ceil(_seconds_to_full(tokens, capacity, refill_rate)))
+            if self.store.compare_and_set(key, current, f"{tokens}:{now}", ttl):
+                return retry_after
+
+
+def _refill_and_take(tokens, updated_at, capacity, refill_rate, now):
+    tokens = min(capacity, tokens + max(0.0, now - updated_at) * refill_rate)
+    if tokens >= 1:
+        return tokens - 1, 0
+    return tokens, (1 - tokens) / refill_rate
+
+
+def _seconds_to_full(tokens, capacity, refill_rate):
+    return (capacity - tokens) / refill_rate
+
+
+class RateLimiter:
+    """Token bucket limiter: `capacity` requests in a burst, refilled at `per_minute`."""
+
+    def __init__(self, per_minute, capacity=None, backend=None, clock=None):
+        self.capacity = capacity if capacity is not None else per_minute
+        self.refill_rate = per_minute / 60.0
+        self.backend = backend if backend is not None else MemoryBucketBackend()
+        self.clock = clock if clock is not None else self.backend.clock
+
+    def hit(self, key):
+        """Consume one token for `key`, returns 0 or the seconds to wait."""
+        return self.backend.take(key, self.capacity, self.refill_rate, self.clock())
+
+
+def client_key():
+    # user_id is chosen by the client until there is authentication, so keying on
+    # it would hand out a fresh bucket per made up id. The client address is set
+    # from X-Forwarded-For by ProxyFix (see PROXY_FIX_X_FOR) behind a router.
+    return f"ip:{request.remote_addr}"
+
+
+def rate_limited(key_func=client_key):
+    """Limit the view with the app's limiter (`app.extensions['limiter']`)."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            limiter = current_app.extensions.get('limiter')
+            if limiter is None:
+                return fn(*args, **kwargs)
+            retry_after = limiter.hit(f"{request.endpoint}:{key_func()}")
+            if retry_after:
+                response = jsonify({"message": "Too many requests"})
+                response.headers['Retry-After'] = str(math.ceil(retry_after))
+                return response, 429
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def coalesced():
+    """Serve concurrent identical GET requests from a single handler run."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            def run():
+                response = make_response(fn(*args, **kwargs))
+                return response.get_data(), response.status_code, list(response.headers.items())
+
+            body, status, headers = current_app.extensions['single_flight'].do(request.full_path, run)
+            return make_response(body, status, headers)
+        return wrapper
+    return decorator
+
+
+def init_throttling(app):
+    """Build this app's limiter and single-flight group from its config."""
+    per_minute = app.config.get("RATE_LIMIT_PER_MINUTE")
+    if per_minute:
+        if app.config.get("RATE_LIMIT_BACKEND") == "shared":
+            if not app.config.get("RATE_LIMIT_REDIS_URL"):
+                raise RuntimeError("RATE_LIMIT_BACKEND=shared needs RATE_LIMIT_REDIS_URL")
+            backend = SharedBucketBackend(RedisStore(app.config["RATE_LIMIT_REDIS_URL"]))
+        else:
+            backend = MemoryBucketBackend()
+        app.extensions["limiter"] = RateLimiter(per_minute, capacity=app.config.get("RATE_LIMIT_BURST"), backend=backend)
+    app.extensions["single_flight"] = SingleFlight()
@@ -1,3 +1,5 @@
+import hashlib
+import json
 from flask import jsonify, url_for
 
 class APIException(Exception):
@@ -20,8 +22,8 @@ def has_no_empty_params(rule):
     arguments = rule.arguments if rule.arguments is not None else ()
     return len(defaults) >= len(arguments)
 
-def generate_sitemap(app):
-    links = ['/admin/']
+def sitemap_links(app):
+    links = ['/admin/'] if 'admin.index' in app.view_functions else []
     for rule in app.url_map.iter_rules():
         # Filter out rules we can't navigate to in a browser
         # and rules that require parameters
@@ -29,7 +31,22 @@ def generate_sitemap(app):
             url = url_for(rule.endpoint, **(rule.defaults or {}))
             if "/admin/" not in url:
                 links.append(url)
+    return links
 
+def sitemap_routes(app):
+    routes = []
+    for rule in sorted(app.url_map.iter_rules(), key=lambda rule: rule.rule):
+        if rule.endpoint == "static" or rule.endpoint.startswith("admin") or "/admin/" in rule.rule:
+            continue
+        routes.append({
+            "path": rule.rule,
+            "endpoint": rule.endpoint,
+            "methods": sorted(rule.methods - {"HEAD", "OPTIONS"}),
+            "parameters": sorted(rule.arguments),
+        })
+    return routes
+
+def render_sitemap(links):
     links_html = "".join(["<li><a href='" + y + "'>" + y + "</a></li>" for y in links])
     return """
         <div style="text-align: center;">
@@ -39,3 +56,22 @@ def generate_sitemap(app):
         <p>Start working on your proyect by following the <a href="https://start.4geeksacademy.com/starters/flask" target="_blank">Quick Start</a></p>
         <p>Remember to specify a real endpoint path like: </p>
         <ul style="text-align: left;">"""+links_html+"</ul></div>"
+
+
+class Sitemap:
+    """Sitemap HTML and JSON rendered once, served as bytes with an ETag."""
+
+    def __init__(self, html, json):
+        self.html = html
+        self.json = json
+        self.etag = hashlib.sha256(html + json).hexdigest()
+
+    @classmethod
+    def from_app(cls, app):
+        # Flask refuses new routes after the first request, so the map is final
+        # once create_app returns. url_for needs a request context.
+        with app.test_request_context():
+            return cls(
+                render_sitemap(sitemap_links(app)).encode("utf-8"),
+                json.dumps(sitemap_routes(app)).encode("utf-8"),
+            )
@@ -1,7 +1,17 @@
 # This file was created to run the application on heroku using gunicorn.
 # Read more about it here: https://devcenter.heroku.com/articles/python-gunicorn
+#
+# The app is built once at import time so that `gunicorn --preload` can create it
+# in the master process and share it with the workers through copy-on-write.
 
-from app import app as application
+import gc
+from app import create_app
+
+application = create_app()
+
+# Move everything allocated so far out of the GC generations, otherwise the first
+# collection in each worker touches (and copies) every preloaded page.
+gc.freeze()
 
 if __name__ == "__main__":
     application.run()
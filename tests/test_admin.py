@@ -0,0 +1,21 @@
+from app import create_app
+from models import db, User, Favorite
+
+
+def test_favorite_form_offers_the_item_types():
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "ENABLE_ADMIN": True, "RATE_LIMIT_PER_MINUTE": 0})
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(email="leia@rebels.org", password="x", username="leia"))
+        db.session.commit()
+    client = app.test_client()
+
+    form = client.get("/admin/favorite/new/").get_data(as_text=True)
+    assert '<option value="character">character</option>' in form
+    assert '<option value="planet">planet</option>' in form
+
+    response = client.post("/admin/favorite/new/", data={"user": "1", "item_type": "planet", "item_id": "2"})
+    assert response.status_code == 302
+    with app.app_context():
+        favorite = Favorite.query.one()
+        assert (favorite.user_id, favorite.item_type, favorite.item_id) == (1, "planet", 2)
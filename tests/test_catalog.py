@@ -0,0 +1,61 @@
+from app import create_app
+from models import db, Planet
+
+
+def test_catalog_catches_up_from_the_change_feed(tmp_path):
+    uri = f"sqlite:///{tmp_path / 'catalog.db'}"
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": uri, "ENABLE_CATALOG": True, "ENABLE_CHANGES": True, "CATALOG_RELOAD_SECONDS": 60,
+    })
+    with app.app_context():
+        db.create_all()
+        db.session.add(Planet(name="Hoth"))
+        db.session.commit()
+    client = app.test_client()
+    assert [planet["name"] for planet in client.get("/planets").get_json()] == ["Hoth"]
+
+    # Written by another process: this app's catalog does not see the commits
+    other = create_app({"SQLALCHEMY_DATABASE_URI": uri, "ENABLE_CHANGES": True})
+    with other.app_context():
+        db.session.get(Planet, 1).name = "Hoth II"
+        db.session.add(Planet(name="Endor"))
+        db.session.commit()
+        db.session.delete(Planet.query.filter_by(name="Endor").one())
+        db.session.add(Planet(name="Naboo"))
+        db.session.commit()
+
+    catalog = app.extensions["catalog"]
+    assert [planet["name"] for planet in client.get("/planets").get_json()] == ["Hoth"]
+    catalog.refreshed_at -= 61
+    assert [planet["name"] for planet in client.get("/planets").get_json()] == ["Hoth II", "Naboo"]
+    assert client.get("/planets/3").get_json()["name"] == "Naboo"
+
+
+def test_listing_bytes_count_in_the_footprint():
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "ENABLE_CATALOG": True})
+    with app.app_context():
+        db.create_all()
+        db.session.add(Planet(name="Hoth"))
+        db.session.commit()
+        catalog = app.extensions["catalog"].ensure_fresh()
+        before = catalog.planets.memory_footprint()
+        listing = catalog.planets.listing()
+        assert catalog.planets.memory_footprint() - before >= len(listing)
+
+
+def test_full_reload_swaps_in_a_serialized_listing():
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "ENABLE_CATALOG": True})
+    with app.app_context():
+        db.create_all()
+        db.session.add(Planet(name="Hoth"))
+        db.session.commit()
+        table = app.extensions["catalog"].ensure_fresh().planets
+        old_listing = table.listing()
+
+        db.session.execute(Planet.__table__.insert(), [{"name": "Endor"}])
+        db.session.commit()
+        table.load()
+
+        assert table._listing is not None and table._listing != old_listing
+        assert [planet["name"] for planet in table.all()] == ["Hoth", "Endor"]
+        assert table.get(2)["name"] == "Endor"
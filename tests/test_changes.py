@@ -0,0 +1,78 @@
+import pytest
+from app import create_app
+from changes import changes_since, compact_changes
+from models import db, Change, Planet
+
+
+@pytest.fixture
+def app():
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "ENABLE_CHANGES": True})
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+def test_versions_are_assigned_at_commit(app):
+    planet = Planet(name="Hoth")
+    db.session.add(planet)
+    db.session.flush()
+    assert db.session.query(Change.version).all() == [(None,)]
+
+    db.session.commit()
+    changes, version, has_more = changes_since(0, 10)
+    assert [(change["table"], change["operation"], change["version"]) for change in changes] == [("planet", "insert", 1)]
+    assert version == 1
+    assert not has_more
+
+
+def test_rolled_back_changes_are_not_numbered(app):
+    db.session.add(Planet(name="Dagobah"))
+    db.session.flush()
+    db.session.rollback()
+
+    db.session.add(Planet(name="Endor"))
+    db.session.commit()
+    changes, version, _ = changes_since(0, 10)
+    assert [change["data"]["name"] for change in changes] == ["Endor"]
+    assert version == 1
+
+
+def test_feed_keeps_latest_change_per_row_and_compacts(app):
+    planet = Planet(name="Naboo")
+    db.session.add(planet)
+    db.session.commit()
+    planet.diameter = 12120
+    db.session.commit()
+
+    changes, version, _ = changes_since(0, 10)
+    assert [(change["operation"], change["version"]) for change in changes] == [("update", 2)]
+    assert version == 2
+
+    assert compact_changes() == 1
+    assert changes_since(0, 10)[0] == changes
+
+
+def test_since_comes_from_the_query_or_last_event_id(app):
+    for name in ("Hoth", "Endor"):
+        db.session.add(Planet(name=name))
+        db.session.commit()
+    client = app.test_client()
+
+    response = client.get("/changes", headers={"Last-Event-ID": "1"})
+    assert response.get_json()["version"] == 2
+    assert [change["data"]["name"] for change in response.get_json()["changes"]] == ["Endor"]
+
+    response = client.get("/changes?since=2", headers={"Last-Event-ID": "0"})
+    assert response.get_json() == {"changes": [], "version": 2, "has_more": False}
+
+
+@pytest.mark.parametrize("query, headers", [
+    ("?since=abc", {}),
+    ("?since=-1", {}),
+    ("", {"Last-Event-ID": "abc"}),
+    ("?limit=abc", {}),
+])
+def test_bad_position_is_rejected(app, query, headers):
+    response = app.test_client().get(f"/changes{query}", headers=headers)
+    assert response.status_code == 400
@@ -0,0 +1,26 @@
+from sqlalchemy import event
+from app import create_app
+from favorites import FavoriteRepository
+from models import db, User
+
+
+def test_favorite_writes_name_the_partition_key():
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://"})
+    with app.app_context():
+        db.create_all()
+        user = User(email="luke@rebels.org", password="x", username="luke", first_name="Luke", last_name="Skywalker")
+        db.session.add(user)
+        db.session.commit()
+        repository = FavoriteRepository()
+        favorite = repository.add(user.id, "planet", 1)
+        repository.add(user.id, "character", 1)
+
+        statements = []
+        event.listen(db.engine, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+        repository.remove(favorite)
+        db.session.delete(user)
+        db.session.commit()
+
+        writes = [statement for statement in statements if statement.startswith(("UPDATE favorite", "DELETE FROM favorite"))]
+        assert len(writes) == 2
+        assert all("favorite.user_id = ?" in statement for statement in writes)
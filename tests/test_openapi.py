@@ -0,0 +1,57 @@
+import pytest
+from app import create_app
+from models import db, User, Planet, Favorite
+
+
+@pytest.fixture
+def app():
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "ENABLE_SWAGGER": True, "RATE_LIMIT_PER_MINUTE": 0})
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(email="han@rebels.org", password="x", username="han"))
+        db.session.add(Planet(name="Corellia"))
+        db.session.commit()
+        yield app
+        db.session.remove()
+
+
+def test_spec_is_served_with_an_etag(app):
+    client = app.test_client()
+    response = client.get("/openapi.json")
+    assert response.status_code == 200
+    spec = response.get_json()
+    assert spec["openapi"] == "3.0.3"
+    assert "requestBody" in spec["paths"]["/favorite/planet/{planet_id}"]["post"]
+    assert response.headers["ETag"]
+
+    response = client.get("/openapi.json", headers={"If-None-Match": response.headers["ETag"]})
+    assert response.status_code == 304
+    assert response.data == b""
+
+
+def test_empty_body_takes_the_defaults(app):
+    response = app.test_client().post("/favorite/planet/1")
+    assert response.status_code == 201
+    assert Favorite.query.one().user_id == 1
+
+
+@pytest.mark.parametrize("user_id", [True, "1", 0, None])
+def test_invalid_user_id_is_rejected(app, user_id):
+    response = app.test_client().post("/favorite/planet/1", json={"user_id": user_id})
+    assert response.status_code == 400
+    assert Favorite.query.count() == 0
+
+
+@pytest.mark.parametrize("body", [[1], "1", 1])
+def test_non_object_body_is_rejected(app, body):
+    response = app.test_client().post("/favorite/planet/1", json=body)
+    assert response.status_code == 400
+    assert Favorite.query.count() == 0
+
+
+@pytest.mark.parametrize("content_type", ["application/json", "text/plain"])
+def test_body_that_is_not_json_is_rejected(app, content_type):
+    response = app.test_client().post("/favorite/planet/1", data="notjson", content_type=content_type)
+    assert response.status_code == 400
+    assert "JSON" in response.get_json()["message"]
+    assert Favorite.query.count() == 0
@@ -0,0 +1,67 @@
+import hashlib
+import hmac
+import os
+import time
+import pytest
+import profiling
+from app import create_app
+from profiling import MAX_SIGNATURE_TTL, profile_sign_command, sign, verify
+
+
+def make_app(tmp_path, **config):
+    return create_app({
+        "SQLALCHEMY_DATABASE_URI": "sqlite://",
+        "RATE_LIMIT_PER_MINUTE": 0,
+        "PROFILE_DIR": str(tmp_path),
+        **config,
+    })
+
+
+def test_signed_request_is_skipped_while_another_is_profiled(tmp_path):
+    client = make_app(tmp_path, PROFILING_SECRET="secret").test_client()
+    headers = {profiling.SIGNATURE_HEADER: sign("secret", "GET", "/healthz")}
+
+    with profiling._cprofile_lock:
+        response = client.get("/healthz", headers=headers)
+    assert "X-Profile-Id" not in response.headers
+    assert response.headers["X-Profile-Skipped"]
+
+    response = client.get("/healthz", headers=headers)
+    assert os.path.exists(tmp_path / f"{response.headers['X-Profile-Id']}.prof")
+    assert not profiling._cprofile_lock.locked()
+
+
+def test_sampled_stacks_are_written_on_flush(tmp_path):
+    app = make_app(tmp_path, PROFILE_SAMPLE_RATE=1, PROFILE_FLUSH_SECONDS=3600)
+    client = app.test_client()
+    client.get("/healthz")
+    path = tmp_path / f"stacks-{os.getpid()}.folded"
+    assert not path.exists()
+
+    app.extensions["profiler"].flush()
+    assert path.exists()
+
+
+def test_signature_profiles_a_single_request(tmp_path):
+    client = make_app(tmp_path, PROFILING_SECRET="secret").test_client()
+    headers = {profiling.SIGNATURE_HEADER: sign("secret", "GET", "/healthz")}
+
+    assert "X-Profile-Id" in client.get("/healthz", headers=headers).headers
+    response = client.get("/healthz", headers=headers)
+    assert "X-Profile-Id" not in response.headers
+    assert response.headers["X-Profile-Skipped"] == "signature already used"
+    assert len(list(tmp_path.glob("*.prof"))) == 1
+
+
+def test_signature_lifetime_is_capped(tmp_path):
+    with pytest.raises(ValueError):
+        sign("secret", "GET", "/healthz", ttl=MAX_SIGNATURE_TTL + 1)
+
+    # A signature made with a longer lifetime than the cap is refused too
+    expires = int(time.time()) + MAX_SIGNATURE_TTL + 60
+    digest = hmac.new(b"secret", f"{expires}:GET /healthz".encode(), hashlib.sha256).hexdigest()
+    assert not verify("secret", f"{expires}:{digest}", "GET", "/healthz")
+
+    app = make_app(tmp_path, PROFILING_SECRET="secret")
+    result = app.test_cli_runner().invoke(profile_sign_command, ["GET", "/healthz", "--ttl", "86400"])
+    assert result.exit_code != 0
@@ -0,0 +1,45 @@
+import pytest
+from app import create_app
+
+
+@pytest.fixture
+def client():
+    return create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://"}).test_client()
+
+
+@pytest.mark.parametrize("path, mimetype", [("/", "text/html"), ("/sitemap.json", "application/json")])
+def test_sitemap_is_served_with_an_etag(client, path, mimetype):
+    response = client.get(path)
+    assert response.status_code == 200
+    assert response.mimetype == mimetype
+    assert response.headers["Cache-Control"] == "public, max-age=300"
+    etag = response.headers["ETag"]
+
+    response = client.get(path, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+
+
+def test_sitemap_json_lists_the_routes(client):
+    routes = {route["path"]: route for route in client.get("/sitemap.json").get_json()}
+    assert routes["/people/<int:people_id>"]["methods"] == ["GET"]
+    assert routes["/people/<int:people_id>"]["parameters"] == ["people_id"]
+    assert "/healthz" in routes
+    assert "/healthz" in client.get("/").get_data(as_text=True)
+
+
+def test_healthz(client):
+    response = client.get("/healthz")
+    assert response.status_code == 200
+    assert response.get_json() == {"status": "ok"}
+
+
+def test_readyz_checks_the_database(client, tmp_path):
+    response = client.get("/readyz")
+    assert response.status_code == 200
+    assert response.get_json()["status"] == "ok"
+
+    unreachable = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'missing' / 'app.db'}"})
+    response = unreachable.test_client().get("/readyz")
+    assert response.status_code == 503
+    assert response.get_json()["status"] == "unavailable"
@@ -0,0 +1,23 @@
+from app import create_app
+from models import db, Character
+
+
+def test_stats_cache_sees_commits_from_other_processes(tmp_path):
+    uri = f"sqlite:///{tmp_path / 'stats.db'}"
+    app = create_app({"SQLALCHEMY_DATABASE_URI": uri, "ENABLE_STATS": True, "ENABLE_CHANGES": True})
+    with app.app_context():
+        db.create_all()
+        db.session.add(Character(name="Luke", gender="male", height=172))
+        db.session.commit()
+    client = app.test_client()
+    assert client.get("/stats/people").get_json()["count"] == 1
+
+    other = create_app({"SQLALCHEMY_DATABASE_URI": uri, "ENABLE_CHANGES": True})
+    with other.app_context():
+        db.session.add(Character(name="Leia", gender="female", height=150))
+        db.session.flush()
+        # As if committed by another worker: this process' table versions are not bumped
+        db.session.info.pop("stats_touched", None)
+        db.session.commit()
+
+    assert client.get("/stats/people").get_json()["count"] == 2
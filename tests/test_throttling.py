@@ -0,0 +1,157 @@
+import threading
+import time
+import pytest
+from flask import Flask, jsonify
+from app import create_app
+from models import db
+from throttling import (
+    LocalSharedStore, MemoryBucketBackend, RateLimiter, SharedBucketBackend, SingleFlight,
+    coalesced, init_throttling, rate_limited,
+)
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_single_flight_runs_concurrent_calls_once():
+    group = SingleFlight()
+    calls = []
+    started = threading.Event()
+
+    def slow():
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        return "result"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(group.do("key", slow))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [1]
+    assert results == ["result"] * 8
+
+
+def test_single_flight_shares_errors_and_forgets_the_key():
+    group = SingleFlight()
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        group.do("key", fail)
+    assert group.do("key", lambda: "next") == "next"
+
+
+@pytest.mark.parametrize("backend", [MemoryBucketBackend, lambda: SharedBucketBackend(LocalSharedStore())])
+def test_rate_limiter_allows_burst_then_refills(backend):
+    clock = FakeClock()
+    limiter = RateLimiter(per_minute=60, capacity=2, backend=backend(), clock=clock)
+
+    assert limiter.hit("a") == 0
+    assert limiter.hit("a") == 0
+    assert limiter.hit("a") == pytest.approx(1.0)
+    assert limiter.hit("b") == 0
+
+    clock.now += 1
+    assert limiter.hit("a") == 0
+
+
+def test_memory_backend_evicts_full_buckets():
+    clock = FakeClock()
+    backend = MemoryBucketBackend(sweep_interval=60)
+    limiter = RateLimiter(per_minute=60, backend=backend, clock=clock)
+    for client in range(100):
+        limiter.hit(str(client))
+    assert len(backend) == 100
+
+    clock.now += 61
+    limiter.hit("new")
+    assert len(backend) == 1
+
+
+def test_shared_backend_uses_wall_clock():
+    assert SharedBucketBackend(LocalSharedStore()).clock is time.time
+    assert RateLimiter(60, backend=SharedBucketBackend(LocalSharedStore())).clock is time.time
+
+
+def make_app(**config):
+    app = Flask(__name__)
+    app.config.update({"RATE_LIMIT_PER_MINUTE": 60, "RATE_LIMIT_BURST": 2, **config})
+    init_throttling(app)
+    runs = []
+
+    @app.route("/limited")
+    @rate_limited()
+    def limited():
+        return jsonify({"ok": True}), 200
+
+    @app.route("/coalesced")
+    @coalesced()
+    def coalesced_view():
+        runs.append(1)
+        time.sleep(0.1)
+        return jsonify({"runs": len(runs)}), 200
+
+    return app, runs
+
+
+def test_rate_limited_returns_429_with_retry_after():
+    app, _ = make_app()
+    client = app.test_client()
+
+    assert client.get("/limited").status_code == 200
+    assert client.get("/limited?user_id=7").status_code == 200
+    response = client.get("/limited?user_id=8")
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+    assert client.get("/limited", environ_base={"REMOTE_ADDR": "10.0.0.2"}).status_code == 200
+
+
+def test_rate_limited_is_off_without_a_rate():
+    app, _ = make_app(RATE_LIMIT_PER_MINUTE=0)
+    client = app.test_client()
+    assert all(client.get("/limited").status_code == 200 for _ in range(5))
+
+
+def test_coalesced_shares_one_response():
+    app, runs = make_app()
+    bodies = []
+
+    def fetch():
+        bodies.append(app.test_client().get("/coalesced").get_json())
+
+    threads = [threading.Thread(target=fetch) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(runs) == 1
+    assert bodies == [{"runs": 1}] * 5
+
+
+@pytest.mark.parametrize("config, limited", [({}, True), ({"PROXY_FIX_X_FOR": 1}, False)])
+def test_forwarded_for_is_only_trusted_behind_a_proxy(config, limited):
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": "sqlite://",
+        "RATE_LIMIT_PER_MINUTE": 60,
+        "RATE_LIMIT_BURST": 2,
+        **config,
+    })
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+    statuses = [
+        client.get("/people", headers={"X-Forwarded-For": f"203.0.113.{n}"}).status_code
+        for n in range(3)
+    ]
+    assert (statuses[-1] == 429) is limited